@@ -6,6 +6,8 @@ import stanza
 import pika, json
 from typing import Dict, Any
 from collections import Counter
+from ner_formats import LABELS, FORMATS, OUTSIDE, is_inside, to_begin, format_result
+from fast_tokenizer import FastTokenizer, stanza_tokenize
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(name)s : %(message)s")
 logging.getLogger("pika").setLevel(level=logging.WARNING)
@@ -14,37 +16,48 @@ logger = logging.getLogger('mynazgul')
 
 
 class BertNerNazgul(Nazgul):
-    def __init__(self, stanza_location: str = 'stanza_model', bert_location: str = 'ner_bert'):
+    def __init__(self, stanza_location: str = 'stanza_model', bert_location: str = 'ner_bert',
+                 fast_tokenizer: bool = False):
         self.tokenizer = stanza.Pipeline(lang='et', dir=stanza_location, processors='tokenize', logging_level='WARN')
+        self.fast_tokenizer = FastTokenizer() if fast_tokenizer else None
         self.bertner = BertForTokenClassification.from_pretrained(bert_location, return_dict=True)
-        self.labelmap = {0: 'B-LOC', 1: 'B-ORG', 2: 'B-PER', 3: 'I-LOC', 4: 'I-ORG', 5: 'I-PER', 6: 'O'}
+        self.labelmap = dict(enumerate(LABELS))
         self.bert_tokenizer = BertTokenizer.from_pretrained(bert_location)
 
     def process_request(self, request: Dict[str, Any]) -> Response:
+        output_format = request.get('format') or 'words'
+        if output_format not in FORMATS:
+            return Response(http_status_code=400,
+                            content='Unknown output format: {}.'.format(output_format))
         try:
-            doc = self.tokenizer(request["text"])
-            extracted_data = doc.to_dict()
             sentences = []
-            for sentence in extracted_data:
-                sentence_collected = []
-                for word in sentence:
-                    text = word.get('text')
-                    sentence_collected.append(text)
-                sentences.append(sentence_collected)
-            tagged_sentences = []
-            for sentence in sentences:
-                entities = self.predict(sentence)
-                words = []
-                for word, entity in zip(sentence, entities):
-                    subresult = {'word': word, 'ner': entity}
-                    words.append(subresult)
-                tagged_sentences.append(words)
-            return Response({"result":tagged_sentences}, mimetype="application/json")
+            offsets = []
+            for sentence in self.tokenize(request["text"]):
+                sentences.append([text for text, _, _ in sentence])
+                offsets.append([(start, end) for _, start, end in sentence])
+            label_ids = [self.predict_ids(sentence) for sentence in sentences]
+            return Response({"result": format_result(sentences, label_ids, output_format, offsets)},
+                            mimetype="application/json")
         except ValueError:
             return Response(http_status_code=413,
                             content='Input is too long.')
 
+    def tokenize(self, text: str) -> list:
+        """
+        Tokenize the text with the rule-based fast path if enabled and the text is simple enough, otherwise with
+        Stanza. Returns sentences of (word, start_char, end_char) tuples.
+        """
+        if self.fast_tokenizer is not None:
+            sentences = self.fast_tokenizer.tokenize(text)
+            logger.debug(f"Tokenizer usage: {dict(self.fast_tokenizer.usage)}")
+            if sentences is not None:
+                return sentences
+        return stanza_tokenize(self.tokenizer, text)
+
     def predict(self, sentence: list) -> list:
+        return [self.labelmap[label_id] for label_id in self.predict_ids(sentence)]
+
+    def predict_ids(self, sentence: list) -> list:
         grouped_inputs = [torch.LongTensor([self.bert_tokenizer.cls_token_id])]
         subtokens_per_token = []
         for token in sentence:
@@ -62,24 +75,18 @@ class BertNerNazgul(Nazgul):
         flattened_inputs = torch.unsqueeze(flattened_inputs, 0)
         predictions_tensor = self.bertner(flattened_inputs)[0]
         predictions_tensor = torch.argmax(predictions_tensor, dim=2)[0]
-        preds = predictions_tensor[1:-1]
-        predictions = [self.labelmap.get(int(pred)) for pred in preds]
-        aligned_predictions = []
+        preds = predictions_tensor[1:-1].tolist()
+        predicted_ids = []
+        previous = OUTSIDE
         ptr = 0
         for size in subtokens_per_token:
-            group = predictions[ptr:ptr + size]
-            aligned_predictions.append(group)
+            label_id = Counter(preds[ptr:ptr + size]).most_common(1)[0][0]
             ptr += size
-        predicted_labels = []
-        previous = 'O'
-        for token, prediction_group in zip(sentence, aligned_predictions):
-            label = Counter(prediction_group).most_common(1)[0][0]
-            base = label.split('-')[-1]
-            if previous == 'O' and label.startswith('I'):
-                label = 'B-' + base
-            previous = label
-            predicted_labels.append(label)
-        return predicted_labels
+            if previous == OUTSIDE and is_inside(label_id):
+                label_id = to_begin(label_id)
+            previous = label_id
+            predicted_ids.append(label_id)
+        return predicted_ids
 
 
 if __name__ == "__main__":
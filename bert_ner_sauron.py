@@ -0,0 +1,9 @@
+from nauron import Sauron
+from ner_formats import FORMATS
+
+
+class BertNerSauron(Sauron):
+    def add_arguments(self):
+        super().add_arguments()
+        self.conf.parser.add_argument('format', type=str, required=False, default='words', choices=FORMATS,
+                                      location='json', help='Output format: {}.'.format(', '.join(FORMATS)))
@@ -0,0 +1,148 @@
+import argparse
+import re
+import threading
+from collections import Counter
+from typing import List, Tuple, Optional, Iterable, Dict, Any
+
+Token = Tuple[str, int, int]
+
+# Words (letters, optionally joined with hyphens) and punctuation marks
+TOKEN = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*|[.,!?;:]")
+NUMBER = re.compile(r"\d")
+QUOTE = re.compile(r"[\"'«»„“”‘’‚`]")
+SUPPORTED = re.compile(r"[^\W\d_]|[ .,!?;:-]")
+SENTENCE_END = '.!?'
+PUNCTUATION = '.,!?;:'
+
+# Common Estonian abbreviations that end with a period
+ABBREVIATIONS = {
+    'a', 'ca', 'dets', 'dr', 'e', 'ekr', 'hr', 'jaan', 'jj', 'jm', 'jms', 'jne', 'jp', 'jt', 'jun', 'jv', 'kl', 'km',
+    'kr', 'lk', 'lp', 'mh', 'mnt', 'mr', 'nn', 'nov', 'nr', 'nt', 'okt', 'p', 'pkr', 'pr', 'prl', 'prof', 'pst', 's',
+    'sept', 'sh', 'sm', 'st', 'tel', 'tn', 'u', 'v', 'vm', 'vms', 'vrd', 'vt', 'õp', 'ü',
+}
+
+
+class FastTokenizer:
+    """
+    A rule-based Estonian sentence and word splitter for short and simple inputs. Texts that may be tokenized
+    ambiguously (numbers, quotes, abbreviations, unusual characters or punctuation) are rejected, in which case the
+    caller should fall back to Stanza. Usage of both paths and the reasons for falling back are counted.
+    """
+    def __init__(self, max_length: int = 300):
+        self.max_length = max_length
+        self.usage = Counter()
+        self.fallback_reasons = Counter()
+        self._lock = threading.Lock()
+
+    def tokenize(self, text: str) -> Optional[List[List[Token]]]:
+        """
+        Split the text into sentences of (word, start_char, end_char) tuples or return None if the text should be
+        tokenized with Stanza instead.
+        """
+        sentences, reason = self.split(text)
+        with self._lock:
+            if sentences is None:
+                self.usage['stanza'] += 1
+                self.fallback_reasons[reason] += 1
+            else:
+                self.usage['fast'] += 1
+        return sentences
+
+    def split(self, text: str) -> Tuple[Optional[List[List[Token]]], Optional[str]]:
+        """
+        Split the text into sentences of (word, start_char, end_char) tuples. Returns the sentences and None, or None
+        and the reason why the text cannot be split reliably.
+        """
+        if len(text) > self.max_length:
+            return None, 'length'
+        if '\n' in text:
+            return None, 'newline'
+        if NUMBER.search(text):
+            return None, 'number'
+        if QUOTE.search(text):
+            return None, 'quote'
+        if len(SUPPORTED.findall(text)) != len(text):
+            return None, 'character'
+
+        tokens = list(TOKEN.finditer(text))
+        # Hyphens that are not inside words are not matched by TOKEN
+        if sum(len(token.group()) for token in tokens) != len(text) - text.count(' '):
+            return None, 'character'
+
+        sentences = []
+        sentence = []
+        for idx, token in enumerate(tokens):
+            word = token.group()
+            if word in PUNCTUATION:
+                previous = tokens[idx - 1].group() if idx > 0 else None
+                if previous is None or previous in PUNCTUATION:
+                    return None, 'punctuation'
+                if word == '.' and (len(previous) == 1 or previous.lower() in ABBREVIATIONS):
+                    return None, 'abbreviation'
+
+            sentence.append((word, token.start(), token.end()))
+
+            if word in SENTENCE_END:
+                following = tokens[idx + 1] if idx + 1 < len(tokens) else None
+                if following is not None:
+                    if following.start() == token.end():
+                        return None, 'punctuation'
+                    if not following.group()[0].isupper():
+                        return None, 'sentence_boundary'
+                sentences.append(sentence)
+                sentence = []
+
+        if sentence:
+            sentences.append(sentence)
+        return sentences, None
+
+
+def stanza_tokenize(pipeline, text: str) -> List[List[Token]]:
+    return [[(token.text, token.start_char, token.end_char) for token in sentence.tokens]
+            for sentence in pipeline(text).sentences]
+
+
+def measure_agreement(fast_tokenizer: FastTokenizer, pipeline, texts: Iterable[str]) -> Dict[str, Any]:
+    """
+    Compare the fast path with Stanza on a corpus. Coverage is the share of texts accepted by the fast path and
+    agreement is the share of accepted texts where both sentence and word boundaries match those of Stanza.
+    """
+    total = accepted = agreed = 0
+    disagreements = []
+    for text in texts:
+        total += 1
+        sentences, _ = fast_tokenizer.split(text)
+        if sentences is None:
+            continue
+        accepted += 1
+        if sentences == stanza_tokenize(pipeline, text):
+            agreed += 1
+        else:
+            disagreements.append(text)
+    return {'texts': total,
+            'coverage': accepted / total if total else 0.0,
+            'agreement': agreed / accepted if accepted else 0.0,
+            'disagreements': disagreements}
+
+
+if __name__ == "__main__":
+    import stanza
+
+    parser = argparse.ArgumentParser(description="Measure the agreement rate of the fast tokenizer with Stanza.")
+    parser.add_argument('corpus', help='A text file with one input text per line.')
+    parser.add_argument('--stanza-location', default='stanza_model')
+    parser.add_argument('--max-length', type=int, default=300)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf8') as f:
+        corpus = [line.rstrip('\n') for line in f if line.strip()]
+
+    tokenizer = FastTokenizer(max_length=args.max_length)
+    stanza_pipeline = stanza.Pipeline(lang='et', dir=args.stanza_location, processors='tokenize',
+                                      logging_level='WARN')
+    results = measure_agreement(tokenizer, stanza_pipeline, corpus)
+
+    print(f"Texts: {results['texts']}, coverage: {round(results['coverage'] * 100, 2)}%, "
+          f"agreement: {round(results['agreement'] * 100, 2)}%")
+    for disagreement in results['disagreements']:
+        print(f"  {disagreement}")
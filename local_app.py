@@ -2,7 +2,8 @@ from flask_restful import Api
 from flask import Flask
 from flask_cors import CORS
 
-from nauron import Sauron, LocalSauronConf
+from nauron import LocalSauronConf
+from bert_ner_sauron import BertNerSauron
 from bert_ner_nazgul import BertNerNazgul
 
 # Define Flask application
@@ -14,7 +15,7 @@ CORS(app)
 conf_bert = LocalSauronConf(nazguls={'public': BertNerNazgul()}, application_required=False)
 
 # Define API endpoints
-api.add_resource(Sauron, '/api/bertner', resource_class_args=(conf_bert, ))
+api.add_resource(BertNerSauron, '/api/bertner', resource_class_args=(conf_bert, ))
 
 
 if __name__ == '__main__':
@@ -3,11 +3,12 @@ import logging
 # Add NullHandler before importing any modules
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
-from nauron.utils import Response
+from nauron.utils import Response, SingleFlight
+from nauron.profiling import Profiler
 from nauron.nazgul import Nazgul
 
 from nauron.config import MQSauronConf, LocalSauronConf
-from nauron.sauron import Sauron
+from nauron.sauron import Sauron, SauronProfiler
 
 from nauron.mq_consumer import MQConsumer
 from nauron.mq_producer import MQProducer
@@ -1,13 +1,14 @@
 import logging
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
 
 from dataclasses import dataclass, field
-from typing import Dict, Union
+from typing import Dict, Union, Optional
 
 from flask_restful.reqparse import RequestParser
 import pika
 
-from nauron import Nazgul
+from nauron import Nazgul, SingleFlight, Profiler
 
 LOGGER = logging.getLogger(__name__)
 
@@ -17,8 +18,12 @@ class SauronConf(ABC):
     nazguls: Dict[str, Union[str, Nazgul]]
     application_required: bool
     parser: RequestParser = field(init=False)
+    single_flight: SingleFlight = field(init=False)
+    profiler: Profiler = field(init=False)
 
     def __post_init__(self):
+        self.single_flight = SingleFlight()
+        self.profiler = Profiler()
         self.parser = RequestParser()
         self.parser.add_argument('token', type=str, location='headers', default='public',
                                  help="A token which defines which service configuration is used.")
@@ -35,6 +40,8 @@ class MQSauronConf(SauronConf):
     exchange_name: str
     max_priority: int = 10
     max_length: int = 20000
+    timeout: Optional[float] = None
+    coalesce_requests: bool = True
 
     def __post_init__(self):
         super().__post_init__()
@@ -50,3 +57,12 @@ class MQSauronConf(SauronConf):
 @dataclass
 class LocalSauronConf(SauronConf):
     nazguls: Dict[str, Nazgul]
+    max_workers: int = 4
+    timeout: Optional[float] = None
+    coalesce_requests: bool = True
+    executor: ThreadPoolExecutor = field(init=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        # Shared between requests, as Flask-RESTful creates a new Sauron instance for each request.
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='nazgul')
@@ -8,7 +8,8 @@ from typing import Optional, Any, Union, Dict
 import pika
 
 from nauron import Nazgul
-from nauron.utils import Response
+from nauron.utils import Response, request_key
+from nauron.profiling import Profiler
 from nauron.nazgul import BatchedNazgul
 
 LOGGER = logging.getLogger(__name__)
@@ -25,9 +26,16 @@ class MQItem:
 class MQConsumer:
     def __init__(self, nazgul: Union[Nazgul, BatchedNazgul],
                  connection_parameters: pika.connection.ConnectionParameters, exchange_name: str,
-                 queue_name: str, mq_max_priority: int = 10):
+                 queue_name: str, mq_max_priority: int = 10, coalesce_requests: bool = True,
+                 profiling: bool = False):
+        """
+        If profiling is enabled, the consumer also listens on the '<queue_name>.profiling' queue for control messages
+        in the format {"requests": N, "output_dir": ...} which enable profiling for the next N requests.
+        """
         self.nazgul = nazgul
         self.queue_name = queue_name
+        self.coalesce_requests = coalesce_requests
+        self.profiler = Profiler()
 
         # Initialize RabbitMQ connecton, channel and queue
         connection = pika.BlockingConnection(connection_parameters)
@@ -46,6 +54,12 @@ class MQConsumer:
         else:
             self.channel.basic_consume(queue=self.queue_name, on_message_callback=self.on_request)
 
+        if profiling:
+            control_queue_name = f"{self.queue_name}.profiling"
+            self.channel.queue_declare(queue=control_queue_name)
+            self.channel.queue_bind(exchange=exchange_name, queue=control_queue_name, routing_key=control_queue_name)
+            self.channel.basic_consume(queue=control_queue_name, on_message_callback=self.on_profiling_request)
+
     def start(self) -> None:
         self.channel.start_consuming()
 
@@ -57,40 +71,67 @@ class MQConsumer:
                               body=response.encode())
         channel.basic_ack(delivery_tag=mq_item.delivery_tag)
 
+    def on_profiling_request(self, channel: pika.adapters.blocking_connection.BlockingChannel,
+                             method: pika.spec.Basic.Deliver, properties: pika.BasicProperties, body: bytes) -> None:
+        try:
+            control = json.loads(body)
+            self.profiler.arm(int(control.get('requests', 1)), control.get('output_dir'))
+        except (ValueError, TypeError, AttributeError):
+            LOGGER.warning(f"Invalid profiling control message: {body}")
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+
     def on_request(self, channel: pika.adapters.blocking_connection.BlockingChannel, method: pika.spec.Basic.Deliver,
                    properties: pika.BasicProperties, body: bytes) -> None:
         t1 = time()
-        mq_item = MQItem(method.delivery_tag,
-                         properties.reply_to,
-                         properties.correlation_id,
-                         json.loads(body))
-
-        response = self.nazgul.process_request(mq_item.body)
-        self.respond(channel, mq_item, response)
+        with self.profiler.profile('on_request'):
+            with self.profiler.stage('decode'):
+                mq_item = MQItem(method.delivery_tag,
+                                 properties.reply_to,
+                                 properties.correlation_id,
+                                 json.loads(body))
+            with self.profiler.stage('process'):
+                response = self.nazgul.process_request(mq_item.body)
+            with self.profiler.stage('respond'):
+                self.respond(channel, mq_item, response)
         t4 = time()
         LOGGER.debug(f"On_request took: {round(t4 - t1, 3)} s. ")
 
     def on_batch_request(self, channel: pika.adapters.blocking_connection.BlockingChannel,
                          method: pika.spec.Basic.Deliver, properties: pika.BasicProperties, body: bytes) -> None:
         t1 = time()
-        batch = [MQItem(method.delivery_tag,
-                        properties.reply_to,
-                        properties.correlation_id,
-                        json.loads(body))]
-
-        while len(batch) < self.nazgul.batch_size:
-            method, properties, body = channel.basic_get(queue=self.queue_name)
-            if method:
-                batch.append(MQItem(method.delivery_tag, properties.reply_to, properties.correlation_id,
-                                    json.loads(body)))
-            else:
-                break
-
-        requests = [mq_item.body for mq_item in batch]
-        responses = self.nazgul.process_batch(requests)
-
-        for mq_item, response in zip(batch, responses):
-            self.respond(channel, mq_item, response)
+        with self.profiler.profile('on_batch_request'):
+            with self.profiler.stage('collect'):
+                batch = [MQItem(method.delivery_tag,
+                                properties.reply_to,
+                                properties.correlation_id,
+                                json.loads(body))]
+
+                while len(batch) < self.nazgul.batch_size:
+                    method, properties, body = channel.basic_get(queue=self.queue_name)
+                    if method:
+                        batch.append(MQItem(method.delivery_tag, properties.reply_to, properties.correlation_id,
+                                            json.loads(body)))
+                    else:
+                        break
+
+            with self.profiler.stage('process'):
+                if self.coalesce_requests:
+                    # Identical requests in the same batch are processed once and all receive the same response
+                    keys = [request_key(self.queue_name, mq_item.body) for mq_item in batch]
+                    unique = {}
+                    for key, mq_item in zip(keys, batch):
+                        unique.setdefault(key, mq_item.body)
+                    responses = dict(zip(unique.keys(), self.nazgul.process_batch(list(unique.values()))))
+                    responses = [responses[key] for key in keys]
+                else:
+                    unique = batch
+                    requests = [mq_item.body for mq_item in batch]
+                    responses = self.nazgul.process_batch(requests)
+
+            with self.profiler.stage('respond'):
+                for mq_item, response in zip(batch, responses):
+                    self.respond(channel, mq_item, response)
 
         t4 = time()
-        LOGGER.debug(f"On_batch_request took: {round(t4 - t1, 3)} s. Batch size: {len(batch)}.")
+        LOGGER.debug(f"On_batch_request took: {round(t4 - t1, 3)} s. Batch size: {len(batch)}, "
+                     f"unique requests: {len(unique)}.")
@@ -1,6 +1,7 @@
 import json
 import uuid
 import logging
+from time import time
 
 from dataclasses import dataclass
 from typing import Optional, Any, Dict, List
@@ -67,9 +68,16 @@ class MQMultiProducer(MQProducer):
         if properties.correlation_id in self.correlation_id:
             self.response[properties.correlation_id] = Response(**json.loads(body))
 
-    def publish_request(self, requests: List[Dict[str, Any]], queue_name: str, priority: int) -> List[Response]:
+    def publish_request(self, requests: List[Dict[str, Any]], queue_name: str, priority: int,
+                        timeout: Optional[float] = None) -> List[Response]:
+        """
+        Publish all subrequests at once so that they can be picked up by any number of consumers in parallel and
+        collect the responses as they arrive. Subrequests that are not answered within the timeout (in seconds) get a
+        504 response.
+        """
         self.init_callback()
         self.correlation_id = []
+        self.response = {}
 
         for request in requests:
             correlation_id = str(uuid.uuid4())
@@ -86,11 +94,21 @@ class MQMultiProducer(MQProducer):
                 body=json.dumps(request)
             )
 
+        deadline = None if timeout is None else time() + timeout
         while len(self.response) < len(self.correlation_id):
-            self.mq_connection.process_data_events()
+            if deadline is None:
+                self.mq_connection.process_data_events(time_limit=None)
+                continue
+            remaining = deadline - time()
+            if remaining <= 0:
+                LOGGER.warning(f"Timed out waiting for {len(self.correlation_id) - len(self.response)} "
+                               f"of {len(self.correlation_id)} responses.")
+                break
+            self.mq_connection.process_data_events(time_limit=remaining)
 
         results = []
         for correlation_id in self.correlation_id:
-            results.append(self.response[correlation_id])
+            results.append(self.response.get(correlation_id,
+                                             Response(content='Request timed out.', http_status_code=504)))
 
         return results
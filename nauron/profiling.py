@@ -0,0 +1,129 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from time import time
+
+from typing import Optional, List, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Profiler:
+    """
+    An opt-in request profiler that can be armed at runtime to profile the next N requests with cProfile and
+    tracemalloc. Only one request is profiled at a time, others are processed as usual. For each profiled request a
+    cProfile dump (.prof) and a text report with the duration and peak allocations of each stage are written to disk.
+    """
+    def __init__(self, output_dir: str = 'profiles', top: int = 30):
+        self.output_dir = output_dir
+        self.top = top
+        self.remaining = 0
+
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._thread = None
+        self._stages: List[Tuple[str, float, int]] = []
+        self._peak = 0
+
+    def arm(self, requests: int = 1, output_dir: Optional[str] = None):
+        """
+        Profile the next N requests. Arming again replaces the previous count, 0 disarms the profiler.
+        """
+        with self._lock:
+            self.remaining = max(requests, 0)
+            if output_dir:
+                self.output_dir = output_dir
+        LOGGER.info(f"Profiling the next {self.remaining} requests, reports are saved to {self.output_dir}.")
+
+    @contextmanager
+    def profile(self, name: str):
+        with self._lock:
+            armed = self.remaining > 0 and self._active.acquire(blocking=False)
+            if armed:
+                self.remaining -= 1
+
+        if not armed:
+            yield
+            return
+
+        self._thread = threading.get_ident()
+        self._stages = []
+        self._peak = 0
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        profile = cProfile.Profile()
+        t1 = time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            duration = time() - t1
+            # Stages reset the tracemalloc peak, so the request-level peak is tracked separately
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            stages = self._stages
+            self._thread = None
+            self._active.release()
+            try:
+                self.dump(name, profile, snapshot, stages, duration, peak)
+            except OSError:
+                LOGGER.exception("Saving the profiling report failed.")
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Record the duration and peak allocations of a stage of the currently profiled request. Outside of profiled
+        requests this does nothing.
+        """
+        if self._thread != threading.get_ident():
+            yield
+            return
+
+        start_memory, start_peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, start_peak)
+        tracemalloc.reset_peak()
+        t1 = time()
+        try:
+            yield
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            self._peak = max(self._peak, peak)
+            self._stages.append((name, time() - t1, peak - start_memory))
+
+    def dump(self, name: str, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot,
+             stages: List[Tuple[str, float, int]], duration: float, peak: int):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir,
+                            f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        profile.dump_stats(path + '.prof')
+
+        report = io.StringIO()
+        report.write(f"{name}: {round(duration, 3)} s, peak allocations: {round(peak / 1024)} KiB\n\n")
+        report.write("Stages:\n")
+        for stage, stage_duration, stage_peak in stages:
+            report.write(f"  {stage}: {round(stage_duration, 3)} s, "
+                         f"peak allocations: {round(stage_peak / 1024)} KiB\n")
+
+        report.write(f"\nTop {self.top} allocations by line:\n")
+        for statistic in snapshot.statistics('lineno')[:self.top]:
+            report.write(f"  {statistic}\n")
+
+        report.write(f"\nTop {self.top} functions by cumulative time:\n")
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+
+        with open(path + '.txt', 'w', encoding='utf8') as f:
+            f.write(report.getvalue())
+        LOGGER.info(f"Profiling report saved to {path}.txt")
@@ -1,12 +1,17 @@
 import logging
 import math
 from abc import abstractmethod
+from concurrent.futures import as_completed, TimeoutError
+from dataclasses import replace
 from typing import Dict, Any, List, Union
 
 from flask_restful import Resource, abort
+from flask_restful.reqparse import RequestParser
 
 from nauron import Response, LocalSauronConf, MQSauronConf
 from nauron.mq_producer import MQProducer, MQMultiProducer
+from nauron.nazgul import BatchedNazgul
+from nauron.utils import request_key
 
 LOGGER = logging.getLogger(__name__)
 
@@ -23,6 +28,7 @@ class Sauron(Resource):
         self.add_arguments()
 
         self.request = None
+        self.token = None
         self.nazgul = None
         self.response = None
 
@@ -38,7 +44,7 @@ class Sauron(Resource):
         """
         try:
             self.nazgul = self.conf.nazguls[self.request['token']]
-            self.request.pop('token')
+            self.token = self.request.pop('token')
         except KeyError:
             abort(401, message="Invalid authentication token.")
 
@@ -68,6 +74,31 @@ class Sauron(Resource):
     def local_process(self):
         self.response = self.nazgul.process_request(self.request)
 
+    def coalesced_process(self):
+        """
+        Process the request unless an identical request with the same token is already being processed, in which case
+        its response (or error) is shared. Requests that wait longer than the configured timeout get a 504 response.
+        """
+        if not self.conf.coalesce_requests:
+            self.process()
+            return
+
+        def process():
+            self.process()
+            return self.response
+
+        try:
+            response = self.conf.single_flight.do(request_key(self.token, self.request), process,
+                                                  timeout=self.conf.timeout)
+        except TimeoutError:
+            abort(504, message="Request timed out.")
+
+        # Shallow copies, so that post-processing one response does not affect the others
+        if isinstance(response, list):
+            self.response = [replace(subresponse) for subresponse in response]
+        else:
+            self.response = replace(response)
+
     def post_process(self):
         """
         Define any post-processing steps to modify the response from Nazgul before returning it to the end user.
@@ -75,14 +106,21 @@ class Sauron(Resource):
         pass
 
     def post(self):
-        self.request = self.conf.parser.parse_args().copy()
-        self.resolve_nazgul()
+        profiler = self.conf.profiler
+        with profiler.profile(type(self).__name__):
+            with profiler.stage('parse'):
+                self.request = self.conf.parser.parse_args().copy()
+                self.resolve_nazgul()
 
-        self.pre_process()
-        self.process()
-        self.post_process()
+            with profiler.stage('pre_process'):
+                self.pre_process()
+            with profiler.stage('process'):
+                self.coalesced_process()
+            with profiler.stage('post_process'):
+                self.post_process()
 
-        return self.response.rest_response()
+            with profiler.stage('respond'):
+                return self.response.rest_response()
 
 
 class MultirequestSauron(Sauron):
@@ -108,25 +146,83 @@ class MultirequestSauron(Sauron):
     def mq_process(self):
         priority = self.calculate_priority()
         producer = MQMultiProducer(self.conf.connection_parameters, self.conf.exchange_name)
-        self.response = producer.publish_request(self.request, queue_name=self.nazgul, priority=priority)
+        self.response = producer.publish_request(self.request, queue_name=self.nazgul, priority=priority,
+                                                 timeout=self.conf.timeout)
 
     def local_process(self):
-        self.response = self.nazgul.process_requests(self.request)
+        """
+        Split the subrequests into chunks (one batch for BatchedNazgul, otherwise a single subrequest) and process them
+        in the shared worker pool. Responses are collected as they finish, failed chunks get a 500 response and chunks
+        that do not finish within the timeout get a 504 response, keeping the order of the subrequests.
+        """
+        chunk_size = self.nazgul.batch_size if isinstance(self.nazgul, BatchedNazgul) else 1
+        chunks = [self.request[i:i + chunk_size] for i in range(0, len(self.request), chunk_size)]
+        futures = {self.conf.executor.submit(self.nazgul.process_requests, chunk): idx
+                   for idx, chunk in enumerate(chunks)}
+        responses = [None] * len(chunks)
+
+        try:
+            for future in as_completed(futures, timeout=self.conf.timeout):
+                idx = futures[future]
+                try:
+                    responses[idx] = future.result()
+                except Exception:
+                    LOGGER.exception("Subrequest processing failed.")
+                    responses[idx] = [Response(content='Internal server error.', http_status_code=500)
+                                      for _ in chunks[idx]]
+        except TimeoutError:
+            LOGGER.warning(f"Timed out waiting for {responses.count(None)} of {len(chunks)} subrequest chunks.")
+            for future, idx in futures.items():
+                if responses[idx] is None:
+                    future.cancel()
+                    responses[idx] = [Response(content='Request timed out.', http_status_code=504)
+                                      for _ in chunks[idx]]
+
+        self.response = [response for chunk in responses for response in chunk]
 
     @abstractmethod
     def post_process(self) -> Response:
         """
         Define any post-processing steps to modify the responses from Nazgul and merge them into a single request
-        which will be returned to the end user.
+        which will be returned to the end user. Responses of failed or timed out subrequests have a non-200 status
+        code, so partial results can be returned if the service allows it.
         """
         pass
 
     def post(self):
-        self.request = self.conf.parser.parse_args().copy()
-        self.resolve_nazgul()
-
-        self.request = self.pre_process()
-        self.process()
+        profiler = self.conf.profiler
+        with profiler.profile(type(self).__name__):
+            with profiler.stage('parse'):
+                self.request = self.conf.parser.parse_args().copy()
+                self.resolve_nazgul()
+
+            with profiler.stage('pre_process'):
+                self.request = self.pre_process()
+            with profiler.stage('process'):
+                self.coalesced_process()
+
+            with profiler.stage('post_process'):
+                self.response = self.post_process()
+            with profiler.stage('respond'):
+                return self.response.rest_response()
+
+
+class SauronProfiler(Resource):
+    """
+    An admin endpoint that enables profiling of the next N requests to the Sauron endpoints which share the same
+    configuration. Reports are saved on the server, see Profiler for details. The endpoint should only be registered on
+    a route that is not publicly accessible, for example:
+        api.add_resource(SauronProfiler, '/admin/profile', resource_class_args=(conf, ))
+    """
+    def __init__(self, conf: Union[LocalSauronConf, MQSauronConf]):
+        self.conf = conf
+        self.parser = RequestParser()
+        self.parser.add_argument('requests', type=int, default=1, location='json',
+                                 help='Number of requests to profile, 0 disables profiling.')
+        self.parser.add_argument('output_dir', type=str, required=False, location='json',
+                                 help='Directory where the profiling reports are saved.')
 
-        self.response = self.post_process()
-        self.response.rest_response()
+    def post(self):
+        args = self.parser.parse_args()
+        self.conf.profiler.arm(args['requests'], args['output_dir'])
+        return {'requests': self.conf.profiler.remaining, 'output_dir': self.conf.profiler.output_dir}
@@ -1,9 +1,12 @@
 import logging
 import json
+import hashlib
+import threading
+from concurrent.futures import Future
 from io import BytesIO
 
 from dataclasses import dataclass, asdict
-from typing import Optional, Union, Dict
+from typing import Optional, Union, Dict, Any, Callable
 
 from flask.helpers import make_response, send_file
 from flask import jsonify
@@ -36,3 +39,48 @@ class Response:
             if type(self.content) == str:
                 self.content = self.content.encode('ISO-8859-1')
             return send_file(BytesIO(self.content), mimetype=self.mimetype)
+
+
+def request_key(token: str, request: Any) -> str:
+    """
+    A content hash of the request which identifies identical requests made with the same token.
+    """
+    content = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha256(f"{token}\n{content}".encode("utf8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, so that only the first caller computes the result and others that
+    arrive while it is running wait for and receive the same result (or exception).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Call fn unless a call with the same key is already in flight. Callers attached to a running call raise
+        concurrent.futures.TimeoutError if the result is not available within the timeout (in seconds).
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            LOGGER.debug(f"Attaching to an in-flight request {key[:12]}.")
+            return future.result(timeout=timeout)
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
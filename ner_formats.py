@@ -0,0 +1,66 @@
+from typing import List, Dict, Any, Optional, Tuple
+
+# Label ids as predicted by the NER model: B- labels, then I- labels of the same entity types, then O.
+ENTITY_TYPES = ['LOC', 'ORG', 'PER']
+LABELS = ['B-' + entity_type for entity_type in ENTITY_TYPES] + \
+         ['I-' + entity_type for entity_type in ENTITY_TYPES] + ['O']
+OUTSIDE = len(LABELS) - 1
+
+FORMATS = ('words', 'columnar', 'columnar_ids', 'entities')
+
+
+def is_inside(label_id: int) -> bool:
+    return len(ENTITY_TYPES) <= label_id < OUTSIDE
+
+
+def to_begin(label_id: int) -> int:
+    return label_id - len(ENTITY_TYPES) if is_inside(label_id) else label_id
+
+
+def entity_spans(sentences: List[List[str]], label_ids: List[List[int]],
+                 offsets: Optional[List[List[Tuple[int, int]]]] = None) -> List[Dict[str, Any]]:
+    """
+    Collect entity spans from label ids. Token offsets are given per sentence with an exclusive end, character
+    offsets are added if token offsets in the original text are known.
+    """
+    entities = []
+    for sentence_idx, (sentence, ids) in enumerate(zip(sentences, label_ids)):
+        start = None
+        entity_type = None
+        # A trailing O closes the last span
+        for token_idx, label_id in enumerate(ids + [OUTSIDE]):
+            continues = is_inside(label_id) and to_begin(label_id) == entity_type
+            if start is not None and not continues:
+                entity = {'type': ENTITY_TYPES[entity_type], 'sentence': sentence_idx, 'start': start,
+                          'end': token_idx, 'text': ' '.join(sentence[start:token_idx])}
+                if offsets is not None:
+                    entity['start_char'] = offsets[sentence_idx][start][0]
+                    entity['end_char'] = offsets[sentence_idx][token_idx - 1][1]
+                entities.append(entity)
+                start = None
+                entity_type = None
+            if label_id != OUTSIDE and not continues:
+                start = token_idx
+                entity_type = to_begin(label_id)
+    return entities
+
+
+def format_result(sentences: List[List[str]], label_ids: List[List[int]], output_format: str = 'words',
+                  offsets: Optional[List[List[Tuple[int, int]]]] = None) -> Any:
+    """
+    Build the response content for the requested output format:
+        words: a list of sentences, each a list of {'word': ..., 'ner': ...} dicts
+        columnar: parallel lists of words and labels per sentence
+        columnar_ids: parallel lists of words and label ids per sentence along with the list of labels
+        entities: only entity spans with their type and token (and character) offsets
+    """
+    if output_format == 'words':
+        return [[{'word': word, 'ner': LABELS[label_id]} for word, label_id in zip(sentence, ids)]
+                for sentence, ids in zip(sentences, label_ids)]
+    if output_format == 'columnar':
+        return {'words': sentences, 'ner': [[LABELS[label_id] for label_id in ids] for ids in label_ids]}
+    if output_format == 'columnar_ids':
+        return {'words': sentences, 'ner': label_ids, 'labels': LABELS}
+    if output_format == 'entities':
+        return {'entities': entity_spans(sentences, label_ids, offsets)}
+    raise ValueError(f"Unknown output format: {output_format}.")
@@ -5,6 +5,7 @@ import torch
 import pika, json
 from typing import Dict, Any
 from collections import Counter
+from ner_formats import LABELS, FORMATS, OUTSIDE, is_inside, to_begin, format_result
 import ast
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(name)s : %(message)s")
@@ -17,26 +18,27 @@ class BertNerNazgul(Nazgul):
     def __init__(self, bert_location='ner_bert'):
         logger.info("Loading BERT NER model...")
         self.bertner = BertForTokenClassification.from_pretrained(bert_location, return_dict=True)
-        self.labelmap = {0: 'B-LOC', 1: 'B-ORG', 2: 'B-PER', 3: 'I-LOC', 4: 'I-ORG', 5: 'I-PER', 6: 'O'}
+        self.labelmap = dict(enumerate(LABELS))
         self.tokenizer = BertTokenizer.from_pretrained(bert_location)
 
     def process_request(self, request: Dict[str, Any]) -> Response:
+        output_format = request.get('format') or 'words'
+        if output_format not in FORMATS:
+            return Response(http_status_code=400,
+                            content='Unknown output format: {}.'.format(output_format))
         try:
             sentences = ast.literal_eval(request['text'])
-            tagged_sentences = []
-            for sentence in sentences:
-                entities = self.predict(sentence)
-                words = []
-                for word, entity in zip(sentence, entities):
-                    subresult = {'word': word, 'ner': entity}
-                    words.append(subresult)
-                tagged_sentences.append(words)
-            return Response({'result':tagged_sentences}, mimetype="application/json")
+            label_ids = [self.predict_ids(sentence) for sentence in sentences]
+            return Response({'result': format_result(sentences, label_ids, output_format)},
+                            mimetype="application/json")
         except ValueError:
             return Response(http_status_code=413,
                             content='Input is too long.')
 
     def predict(self, sentence: list) -> list:
+        return [self.labelmap[label_id] for label_id in self.predict_ids(sentence)]
+
+    def predict_ids(self, sentence: list) -> list:
         grouped_inputs = [torch.LongTensor([self.tokenizer.cls_token_id])]
         subtokens_per_token = []
         for token in sentence:
@@ -54,24 +56,18 @@ class BertNerNazgul(Nazgul):
         flattened_inputs = torch.unsqueeze(flattened_inputs, 0)
         predictions_tensor = self.bertner(flattened_inputs)[0]
         predictions_tensor = torch.argmax(predictions_tensor, dim=2)[0]
-        preds = predictions_tensor[1:-1]
-        predictions = [self.labelmap.get(int(pred)) for pred in preds]
-        aligned_predictions = []
+        preds = predictions_tensor[1:-1].tolist()
+        predicted_ids = []
+        previous = OUTSIDE
         ptr = 0
         for size in subtokens_per_token:
-            group = predictions[ptr:ptr + size]
-            aligned_predictions.append(group)
+            label_id = Counter(preds[ptr:ptr + size]).most_common(1)[0][0]
             ptr += size
-        predicted_labels = []
-        previous = 'O'
-        for token, prediction_group in zip(sentence, aligned_predictions):
-            label = Counter(prediction_group).most_common(1)[0][0]
-            base = label.split('-')[-1]
-            if previous == 'O' and label.startswith('I'):
-                label = 'B-' + base
-            previous = label
-            predicted_labels.append(label)
-        return predicted_labels
+            if previous == OUTSIDE and is_inside(label_id):
+                label_id = to_begin(label_id)
+            previous = label_id
+            predicted_ids.append(label_id)
+        return predicted_ids
 
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ from nauron import Response, Nazgul, MQConsumer
 import stanza
 import pika, json
 from typing import Dict, Any
+from fast_tokenizer import FastTokenizer, stanza_tokenize
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(name)s : %(message)s")
 logging.getLogger("pika").setLevel(level=logging.WARNING)
@@ -11,21 +12,20 @@ logger = logging.getLogger('mynazgul')
 
 
 class StanzaTokenizerNazgul(Nazgul):
-    def __init__(self, stanza_location='stanza_model'):
+    def __init__(self, stanza_location='stanza_model', fast_tokenizer=False):
         logger.info("Loading Stanza tokenizer model...")
         self.tokenizer = stanza.Pipeline(lang='et', dir=stanza_location, processors='tokenize', logging_level='WARN')
+        self.fast_tokenizer = FastTokenizer() if fast_tokenizer else None
 
     def process_request(self, request: Dict[str, Any]) -> Response:
         try:
-            doc = self.tokenizer(request["text"])
-            extracted_data = doc.to_dict()
-            sentences = []
-            for sentence in extracted_data:
-                sentence_collected = []
-                for word in sentence:
-                    text = word.get('text')
-                    sentence_collected.append(text)
-                sentences.append(sentence_collected)
+            sentences = None
+            if self.fast_tokenizer is not None:
+                sentences = self.fast_tokenizer.tokenize(request["text"])
+                logger.debug(f"Tokenizer usage: {dict(self.fast_tokenizer.usage)}")
+            if sentences is None:
+                sentences = stanza_tokenize(self.tokenizer, request["text"])
+            sentences = [[text for text, _, _ in sentence] for sentence in sentences]
             return Response({'text':sentences}, mimetype="application/json")
 
         except ValueError: